@@ -1,5 +1,6 @@
 from crewai import Agent
 from tools import news_fetcher
+from routing import ROUTES, make_llm
 
 reporter1 = Agent(
     role='Politics News Reporter',
@@ -9,6 +10,7 @@ reporter1 = Agent(
     for identifying the most significant political developments.""",
     tools=[news_fetcher],
     verbose=True,
+    llm=make_llm(ROUTES["politics_reporter"]["model"]),
     allow_delegation=False
 )
 
@@ -20,6 +22,7 @@ reporter2 = Agent(
     in identifying the most impactful technology stories.""",
     tools=[news_fetcher],
     verbose=True,
+    llm=make_llm(ROUTES["tech_reporter"]["model"]),
     allow_delegation=False
 )
 
@@ -31,5 +34,13 @@ analyst = Agent(
     that capture the essence of multiple news stories while maintaining clarity and readability.""",
     tools=[],
     verbose=True,
+    llm=make_llm(ROUTES["analyst"]["model"]),
     allow_delegation=False
-)
\ No newline at end of file
+)
+
+# Routing policy for each agent (see routing.py); the model is re-chosen every run
+AGENT_ROUTES = {
+    reporter1.role: "politics_reporter",
+    reporter2.role: "tech_reporter",
+    analyst.role: "analyst",
+}
\ No newline at end of file
@@ -1,20 +1,19 @@
 import streamlit as st
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 from dotenv import load_dotenv
-import threading
-import queue
 
 # Load environment variables
 load_dotenv()
 
 # Import your CrewAI components
 try:
-    from agents import reporter1, reporter2, analyst
-    from tasks import report_task1, report_task2, summary_task
-    from crewai import Crew
+    from agents import analyst
+    from jobs import JobRunner, FINISHED_STATES, SUCCEEDED, CANCELLED
+    from tasks import CATEGORY_SECTIONS
+    import history
 except ImportError as e:
     st.error(f"Error importing CrewAI components: {e}")
     st.stop()
@@ -72,13 +71,115 @@ def check_api_keys():
     
     return missing_keys
 
-def run_crew_in_thread(crew, result_queue):
-    """Run CrewAI crew in a separate thread"""
-    try:
-        result = crew.kickoff()
-        result_queue.put(("success", result))
-    except Exception as e:
-        result_queue.put(("error", str(e)))
+@st.cache_resource
+def get_job_runner():
+    """Shared report backend, also used by the HTTP service (server.py)"""
+    runner = JobRunner()
+    runner.start()
+    return runner
+
+def task_progress(events):
+    """Map finished crew stages to a progress percentage and status line"""
+    finished = sum(1 for event in events if event["event"] in ("stage_completed", "stage_missed"))
+    analyst_started = any(event["event"] == "stage_started" and event["data"]["agent"] == analyst.role
+                          for event in events)
+    if analyst_started:
+        return 75, "📊 Analyst creating summary..."
+    return 10 + 25 * finished, "🏛️💻 Reporters fetching politics and tech news in parallel..."
+
+@st.cache_data(ttl=60)
+def load_run_index(start_date, end_date):
+    """Run metrics for a date range; only the index columns are read"""
+    columns = ["date", "run_id", "started_at", "status", "latency_s",
+               "total_tokens", "article_count", "story_count", "analyst_input_chars", "headline_count"]
+    runs = history.scan("runs", columns=columns, start_date=start_date, end_date=end_date)
+    return runs.to_pandas().sort_values("started_at", ascending=False)
+
+@st.cache_data(ttl=60)
+def load_agent_metrics(start_date, end_date):
+    """Per-agent, per-model latency and token averages for a date range"""
+    stages = history.scan("stages", columns=["agent", "model", "latency_s", "total_tokens", "over_budget"],
+                          start_date=start_date, end_date=end_date).to_pandas()
+    if stages.empty:
+        return stages
+    return stages.groupby(["agent", "model"], as_index=False).agg(
+        runs=("latency_s", "size"),
+        avg_latency_s=("latency_s", "mean"),
+        avg_tokens=("total_tokens", "mean"),
+        over_budget=("over_budget", "sum"),
+    )
+
+@st.cache_data(ttl=600)
+def load_trending(run_id, start_date, end_date):
+    """Story clusters of one run, largest first within each category"""
+    clusters = history.scan("clusters", columns=["category", "position", "size", "title", "sources", "selected"],
+                            start_date=start_date, end_date=end_date, run_ids=[run_id])
+    return clusters.to_pandas().sort_values(["category", "position"])
+
+def show_trending(run):
+    """Stories covered by the most articles in the last run"""
+    clusters = load_trending(run["id"], run["started_at"][:10], run["finished_at"][:10])
+    if clusters.empty:
+        return
+    st.subheader("🔥 Trending Stories")
+    columns = st.columns(clusters["category"].nunique())
+    for column, (category, stories) in zip(columns, clusters.groupby("category")):
+        with column:
+            st.markdown(f"**{CATEGORY_SECTIONS.get(category, category)}**")
+            for story in stories.head(5).itertuples():
+                sources = ", ".join(story.sources)
+                star = "★ " if story.selected else ""
+                st.markdown(f"- {star}{story.title}  \n  _{story.size} article(s): {sources}_")
+
+@st.cache_data(ttl=600)
+def load_run_details(run_id, date):
+    """Summary sections and headlines of a single run"""
+    sections = history.scan("sections", columns=["position", "heading", "body"],
+                            start_date=date, end_date=date, run_ids=[run_id])
+    headlines = history.scan("headlines", columns=["agent", "position", "title", "source", "published_at"],
+                             start_date=date, end_date=date, run_ids=[run_id])
+    return sections.to_pandas().sort_values("position"), headlines.to_pandas()
+
+def show_history():
+    """Report history view; reads only the days and columns it displays"""
+    today = datetime.now().date()
+    date_range = st.date_input("Date range", value=(today - timedelta(days=7), today))
+    if len(date_range) != 2:
+        return
+    start_date, end_date = (d.strftime("%Y-%m-%d") for d in date_range)
+    
+    runs = load_run_index(start_date, end_date)
+    if runs.empty:
+        st.info("No reports recorded in this date range.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Runs", len(runs))
+    with col2:
+        st.metric("Avg. latency", f"{runs['latency_s'].mean():.0f}s")
+    with col3:
+        st.metric("Tokens used", f"{int(runs['total_tokens'].fillna(0).sum()):,}")
+    
+    agent_metrics = load_agent_metrics(start_date, end_date)
+    if not agent_metrics.empty:
+        st.subheader("Per-agent models")
+        st.dataframe(agent_metrics, use_container_width=True, hide_index=True)
+    
+    st.dataframe(runs.drop(columns=["date"]).head(200), use_container_width=True, hide_index=True)
+    
+    run_id = st.selectbox("Open report", runs["run_id"],
+                          format_func=lambda r: runs.loc[runs["run_id"] == r, "started_at"].iloc[0]
+                          .strftime("%Y-%m-%d %H:%M:%S"))
+    if run_id:
+        date = runs.loc[runs["run_id"] == run_id, "date"].iloc[0]
+        sections, headlines = load_run_details(run_id, date)
+        for section in sections.itertuples():
+            if section.heading:
+                st.markdown(f"#### {section.heading}")
+            st.markdown(section.body)
+        if not headlines.empty:
+            st.dataframe(headlines, use_container_width=True, hide_index=True)
 
 def main():
     # Header
@@ -140,6 +241,12 @@ OPENAI_API_KEY=your_openai_api_key_here
             
         if 'last_run_time' not in st.session_state:
             st.session_state.last_run_time = None
+
+        if 'job_id' not in st.session_state:
+            st.session_state.job_id = None
+
+        if 'last_run' not in st.session_state:
+            st.session_state.last_run = None
     
     with col2:
         # Agent Status Panel
@@ -164,70 +271,56 @@ OPENAI_API_KEY=your_openai_api_key_here
     
     # Handle news fetching
     if run_button and not st.session_state.crew_running:
-        st.session_state.crew_running = True
-        st.session_state.last_result = None
-        
-        # Create progress indicators
-        progress_container = st.container()
+        try:
+            runner = get_job_runner()
+            st.session_state.job_id = runner.submit({"verbose": verbose_mode})
+            st.session_state.crew_running = True
+            st.session_state.last_result = None
+        except Exception as e:
+            st.error(f"❌ Failed to initialize crew: {str(e)}")
+    
+    # Poll the running job; each rerun only checks its status, so the
+    # script thread is never blocked for the length of the crew run
+    if st.session_state.job_id:
+        runner = get_job_runner()
+        job = runner.store.get(st.session_state.job_id)
         
-        with progress_container:
-            st.info("🔄 Initializing AI agents...")
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        if job is None:
+            st.session_state.job_id = None
+            st.session_state.crew_running = False
+        elif job["status"] in FINISHED_STATES:
+            st.session_state.job_id = None
+            st.session_state.crew_running = False
             
-            # Create and configure crew
-            try:
-                crew = Crew(
-                    agents=[reporter1, reporter2, analyst],
-                    tasks=[report_task1, report_task2, summary_task],
-                    verbose=verbose_mode,
-                    process="sequential"
-                )
-                
-                progress_bar.progress(25)
-                status_text.text("🏛️ Politics reporter fetching Indian news...")
-                
-                # Run crew in background thread
-                result_queue = queue.Queue()
-                crew_thread = threading.Thread(target=run_crew_in_thread, args=(crew, result_queue))
-                crew_thread.start()
-                
-                # Monitor progress
-                progress = 25
-                while crew_thread.is_alive():
-                    time.sleep(1)
-                    progress = min(progress + 5, 90)
-                    progress_bar.progress(progress)
-                    
-                    if progress < 60:
-                        status_text.text("🏛️ Politics reporter working...")
-                    elif progress < 80:
-                        status_text.text("💻 Tech reporter gathering global news...")
-                    else:
-                        status_text.text("📊 Analyst creating summary...")
-                
-                crew_thread.join()
-                
-                # Get result
-                result_type, result_data = result_queue.get()
-                
-                progress_bar.progress(100)
-                status_text.text("✅ News collection completed!")
-                
-                if result_type == "success":
-                    st.session_state.last_result = result_data
-                    st.session_state.last_run_time = datetime.now()
-                    st.success("🎉 News successfully fetched and analyzed!")
+            if job["status"] == SUCCEEDED:
+                st.session_state.last_result = job["result"]
+                st.session_state.last_run_time = datetime.now()
+                st.session_state.last_run = job
+                events = runner.store.events_since(job["id"])
+                partial = [event["data"]["missing"] for event in events if event["event"] == "partial"]
+                if partial:
+                    st.warning("⚠️ Partial report: " + "; ".join(
+                        f"{role} {reason}" for role, reason in partial[-1].items()))
                 else:
-                    st.error(f"❌ Error occurred: {result_data}")
-                
-            except Exception as e:
-                st.error(f"❌ Failed to initialize crew: {str(e)}")
-            
-            finally:
-                st.session_state.crew_running = False
-                time.sleep(2)  # Brief pause before clearing progress
-                progress_container.empty()
+                    st.success("🎉 News successfully fetched and analyzed!")
+            elif job["status"] == CANCELLED:
+                st.warning("⏹️ News fetching was cancelled.")
+            else:
+                st.error(f"❌ Error occurred: {job['error']}")
+        else:
+            st.info("🔄 AI agents are working on your report...")
+            events = runner.store.events_since(job["id"])
+            progress, status = task_progress(events)
+            st.progress(progress)
+            st.text(status)
+            for event in events:
+                if event["event"] == "stage_missed":
+                    icon = "⏱️" if event["data"].get("timed_out") else "❌"
+                    st.warning(f"{icon} {event['data']['agent']} did not finish: {event['data']['reason']}")
+            if st.button("⏹️ Cancel"):
+                runner.cancel(job["id"])
+            time.sleep(1)
+            st.rerun()
     
     # Display Results
     if st.session_state.last_result:
@@ -249,6 +342,14 @@ OPENAI_API_KEY=your_openai_api_key_here
             file_name=f"news_report_{datetime.now().strftime('%Y%m%d_%H%M')}.txt",
             mime="text/plain"
         )
+        
+        if st.session_state.last_run:
+            show_trending(st.session_state.last_run)
+    
+    # Report History (loaded only when opened)
+    st.header("📚 Report History")
+    if st.toggle("Show past reports", value=False):
+        show_history()
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,125 @@
+"""
+Cancellation tokens and deadlines for crew runs.
+
+A CancelToken is cancelled explicitly (the Cancel button, DELETE on the API,
+Ctrl+C) or when its deadline passes. Child tokens add a tighter deadline for
+one stage and are cancelled with their parent.
+
+The current token is held in a context variable, so the news tool and the
+LLM client can check it without it being threaded through crewai. Blocking
+calls wrapped in run_cancellable() return as soon as the token is cancelled.
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+POLL_SECONDS = 0.1
+
+
+class RunCancelled(Exception):
+    """The run was cancelled before this work finished"""
+
+
+class DeadlineExceeded(RunCancelled):
+    """A run or stage deadline passed before this work finished"""
+
+
+class CancelToken:
+    def __init__(self, deadline=None, name="run", parent=None):
+        """deadline is in seconds from now; None means no deadline"""
+        self.name = name
+        self.parent = parent
+        self.deadline_at = time.monotonic() + deadline if deadline is not None else None
+        self._event = threading.Event()
+        self._reason = None
+
+    def child(self, deadline=None, name="stage"):
+        """Token for one stage; cancelled with this token or at its own deadline"""
+        return CancelToken(deadline, name=name, parent=self)
+
+    def cancel(self, reason="Cancelled"):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    def remaining(self):
+        """Seconds until the nearest deadline, or None without a deadline"""
+        remaining = None
+        if self.deadline_at is not None:
+            remaining = max(0.0, self.deadline_at - time.monotonic())
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None:
+                remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return remaining
+
+    def error(self):
+        """The exception describing why this token is cancelled, or None"""
+        if self.parent is not None:
+            parent_error = self.parent.error()
+            if parent_error is not None:
+                return parent_error
+        if self._event.is_set():
+            return RunCancelled(self._reason)
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            return DeadlineExceeded(f"{self.name} missed its deadline")
+        return None
+
+    @property
+    def cancelled(self):
+        return self.error() is not None
+
+    def raise_if_cancelled(self):
+        error = self.error()
+        if error is not None:
+            raise error
+
+
+_current_token = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token():
+    return _current_token.get()
+
+
+@contextmanager
+def use_token(token):
+    """Make token the current token while the block runs"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def run_cancellable(fn, *args, **kwargs):
+    """Call fn, but give up as soon as the current token is cancelled
+
+    fn runs on a helper thread; if the token is cancelled first, its result
+    is discarded and RunCancelled/DeadlineExceeded is raised immediately.
+    Callers should still give fn a timeout so the helper thread ends.
+    """
+    token = current_token()
+    if token is None:
+        return fn(*args, **kwargs)
+    token.raise_if_cancelled()
+
+    outcome = {}
+    done = threading.Event()
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            outcome["value"] = context.run(fn, *args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    while not done.wait(POLL_SECONDS):
+        token.raise_if_cancelled()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
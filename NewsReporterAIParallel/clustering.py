@@ -0,0 +1,125 @@
+"""
+Groups fetched articles into story clusters.
+
+Articles are embedded with the same TF-IDF vectors as ranking.py, and
+articles whose cosine similarity to a story's leading article reaches
+SIMILARITY_THRESHOLD join that story. Instead of the reporters' headline
+lists, the analyst sees one line for each story a reporter picked plus the
+TOP_STORIES largest other stories, within the size of the list they replace.
+The full cluster list goes to the history and the Trending view.
+"""
+import numpy as np
+from scipy import sparse
+
+from ranking import tfidf_matrix
+
+SIMILARITY_THRESHOLD = 0.45
+# Stories covered by several articles that the analyst sees besides the reporter's picks
+TOP_STORIES = 3
+
+
+def _source(article):
+    # Captured articles store the source name; raw NewsAPI articles a dict
+    source = article.get("source") or ""
+    return (source.get("name") or "") if isinstance(source, dict) else source
+
+
+def _published(article):
+    return article.get("published_at") or article.get("publishedAt") or ""
+
+
+def cluster_articles(articles, threshold=SIMILARITY_THRESHOLD):
+    """Cluster articles into stories, largest and most recent first
+
+    Each cluster is a dict with the representative article's title, source
+    and date, the cluster size, the distinct sources that covered it and
+    whether a reporter picked one of its articles as a headline.
+    """
+    # The same article can be captured by more than one tool call
+    _, first = np.unique([a.get("url") or a.get("title") or "" for a in articles], return_index=True)
+    articles = [articles[i] for i in sorted(first)]
+    if not articles:
+        return []
+
+    texts = [f"{a.get('title') or ''} {a.get('description') or ''}" for a in articles]
+    vectors, _ = tfidf_matrix(texts)
+    similarity = (vectors @ vectors.T).tocsr()
+    similarity.data[similarity.data < threshold] = 0
+    similarity.eliminate_zeros()
+
+    # Leader clustering: the article with the most near-duplicates seeds a
+    # story and takes all its unassigned neighbours. Unlike connected
+    # components this does not chain loosely related stories together.
+    n = len(articles)
+    labels = np.full(n, -1)
+    n_clusters = 0
+    for leader in np.argsort(-np.diff(similarity.indptr), kind="stable"):
+        if labels[leader] >= 0:
+            continue
+        neighbours = similarity.indices[similarity.indptr[leader]:similarity.indptr[leader + 1]]
+        labels[neighbours[labels[neighbours] < 0]] = n_clusters
+        labels[leader] = n_clusters
+        n_clusters += 1
+
+    # Representative: the member closest to its cluster's centroid
+    membership = sparse.csr_matrix((np.ones(n), (labels, np.arange(n))), shape=(n_clusters, n))
+    centroids = (membership @ vectors).tocsr()
+    closeness = np.asarray(vectors.multiply(centroids[labels]).sum(axis=1)).ravel()
+    order = np.lexsort((-closeness, labels))
+    first_of_cluster = np.ones(n, dtype=bool)
+    first_of_cluster[1:] = labels[order][1:] != labels[order][:-1]
+    # Members of each cluster, representative first
+    groups = np.split(order, np.flatnonzero(first_of_cluster)[1:])
+
+    clusters = []
+    for group in groups:
+        members = [articles[i] for i in group]
+        article = members[0]
+        source = _source(article)
+        clusters.append({
+            "size": len(members),
+            "title": (article.get("title") or "").replace(f" - {source}", "").strip(),
+            "source": source,
+            "published_at": _published(article)[:10],
+            "latest": max(_published(m) for m in members),
+            "sources": sorted({_source(m) for m in members} - {""}),
+            "selected": any(m.get("selected") for m in members),
+        })
+    clusters.sort(key=lambda c: (c["size"], c["latest"]), reverse=True)
+    return clusters
+
+
+def cluster_by_category(articles, threshold=SIMILARITY_THRESHOLD):
+    """Cluster captured articles (see tools.capture_articles) separately per category"""
+    by_category = {}
+    for article in articles:
+        by_category.setdefault(article.get("category") or "", []).append(article)
+    return {category: cluster_articles(items, threshold)
+            for category, items in by_category.items()}
+
+
+def _story_line(cluster):
+    star = "★ " if cluster.get("selected") else ""
+    if cluster["size"] == 1:
+        return f"- {star}{cluster['title']} ({cluster['source']})"
+    # "(Reuters +4, 7×)": representative source, other sources, article count
+    others = len(cluster["sources"]) - 1
+    sources = cluster["source"] + (f" +{others}" if others > 0 else "")
+    return f"- {star}{cluster['title']} ({sources}, {cluster['size']}×)"
+
+
+def format_clusters(clusters, top_stories=TOP_STORIES, max_chars=None):
+    """Prompt lines for the reporter's picks (starred) and the largest other stories
+
+    clusters is cluster_articles() output, largest first. Other stories need
+    at least two articles and are only added while the text stays within
+    max_chars.
+    """
+    lines = [_story_line(c) for c in clusters if c.get("selected")]
+    others = [c for c in clusters if not c.get("selected") and c["size"] >= 2][:top_stories]
+    for cluster in others:
+        line = _story_line(cluster)
+        if max_chars is not None and len("\n".join(lines + [line])) > max_chars:
+            break
+        lines.append(line)
+    return "\n".join(lines)
@@ -1,8 +1,21 @@
 #!/usr/bin/env python3
 """
 Debug script to test your NewsAPI setup and CrewAI configuration
+
+    python debug_setup.py                   # setup checks
+    python debug_setup.py --profile -n 10   # concurrent latency profile
+    python debug_setup.py --profile --mock  # profile against local stand-ins
 """
 import os
+import json
+import ssl
+import socket
+import argparse
+import math
+import http.client
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlencode
 import requests
 from dotenv import load_dotenv
 
@@ -172,11 +185,203 @@ def test_openai_connection():
         print("❌ OpenAI package not installed")
         return False
 
+def timed_request(method, url, params=None, headers=None, body=None, timeout=30):
+    """Make one HTTP request, timing DNS, connect, TLS, first byte and total (ms)"""
+    parsed = urlparse(url)
+    secure = parsed.scheme == "https"
+    host = parsed.hostname
+    default_port = 443 if secure else 80
+    port = parsed.port or default_port
+    # HTTPConnection below would send "Host: host:443" for HTTPS; send what a client would
+    host_header = f"[{host}]" if ":" in host else host
+    if port != default_port:
+        host_header += f":{port}"
+    path = (parsed.path or "/") + ("?" + urlencode(params) if params else "")
+    timings = {}
+
+    start = time.perf_counter()
+    family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    timings["dns"] = (time.perf_counter() - start) * 1000
+
+    sock = socket.socket(family, socktype, proto)
+    sock.settimeout(timeout)
+    try:
+        mark = time.perf_counter()
+        sock.connect(address)
+        timings["connect"] = (time.perf_counter() - mark) * 1000
+
+        mark = time.perf_counter()
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        timings["tls"] = (time.perf_counter() - mark) * 1000
+
+        # Reuse the already-connected socket so the phases above are not repeated
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        mark = time.perf_counter()
+        conn.request(method, path, body=body, headers={"Host": host_header, **(headers or {})})
+        response = conn.getresponse()
+        timings["ttfb"] = (time.perf_counter() - mark) * 1000
+        data = response.read()
+        timings["total"] = (time.perf_counter() - start) * 1000
+    finally:
+        sock.close()
+
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        payload = None
+    return {"status": response.status, "bytes": len(data), "timings": timings, "json": payload}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[index]
+
+def build_probes(newsapi_base, newsapi_key, llm_base, llm_key, llm_chat=False):
+    """List of (name, request kwargs, result counter) to profile"""
+    from tools import (POLITICS_QUERIES, POLITICS_DOMAINS, TECH_QUERIES, TECH_DOMAINS,
+                       CANDIDATES_PER_QUERY)
+
+    def count_articles(payload):
+        return len((payload or {}).get("articles", []))
+
+    def count_models(payload):
+        return len((payload or {}).get("data", []))
+
+    probes = [
+        ("newsapi top-headlines (in)", {
+            "method": "GET", "url": f"{newsapi_base}/v2/top-headlines",
+            "params": {"country": "in", "pageSize": 10, "apiKey": newsapi_key}}, count_articles),
+        ("newsapi everything (India)", {
+            "method": "GET", "url": f"{newsapi_base}/v2/everything",
+            "params": {"q": "India", "language": "en", "pageSize": 10, "apiKey": newsapi_key}}, count_articles),
+    ]
+    # Every step of both query cascades, against its configured domain list
+    for label, queries, domains in (("politics", POLITICS_QUERIES, POLITICS_DOMAINS),
+                                    ("tech", TECH_QUERIES, TECH_DOMAINS)):
+        for step, query in enumerate(queries, 1):
+            probes.append((f"{label} cascade #{step}", {
+                "method": "GET", "url": f"{newsapi_base}/v2/everything",
+                "params": {"q": query, "language": "en", "pageSize": CANDIDATES_PER_QUERY,
+                           "sortBy": "publishedAt", "domains": domains, "apiKey": newsapi_key}},
+                count_articles))
+
+    auth = {"Authorization": f"Bearer {llm_key}"}
+    probes.append(("llm models", {"method": "GET", "url": f"{llm_base}/models", "headers": auth},
+                   count_models))
+    if llm_chat:
+        from routing import ROUTES
+
+        # Every model the agents run on or fall back to
+        models = sorted({m for route in ROUTES.values() for m in (route["model"], route["fallback"]) if m})
+        for model in models:
+            body = json.dumps({
+                "model": model,
+                "messages": [{"role": "user", "content": "Reply with OK."}],
+                "max_tokens": 1,
+            })
+            probes.append((f"llm chat {model}"[:28], {
+                "method": "POST", "url": f"{llm_base}/chat/completions", "body": body,
+                "headers": {**auth, "Content-Type": "application/json"}},
+                lambda payload: len((payload or {}).get("choices", []))))
+    return probes
+
+def run_probe(name, request, counter):
+    try:
+        result = timed_request(**request)
+        ok = 200 <= result["status"] < 300
+        return name, {"ok": ok, "status": result["status"], "timings": result["timings"],
+                      "count": counter(result["json"]) if ok else None}
+    except Exception as e:
+        return name, {"ok": False, "status": None, "error": str(e)}
+
+def profile_endpoints(runs=5, concurrency=8, mock=False, llm_chat=False):
+    """Probe every endpoint and query `runs` times concurrently and print latency stats"""
+    print("\n🔍 Profiling NewsAPI and LLM Endpoints")
+    print("=" * 50)
+    
+    load_dotenv()
+    newsapi_base = os.getenv("NEWSAPI_BASE_URL", "https://newsapi.org").rstrip("/")
+    llm_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
+    newsapi_key = os.getenv("NEWSAPI_KEY")
+    llm_key = os.getenv("OPENAI_API_KEY")
+    
+    server = None
+    if mock:
+        from mock_services import start_mock_server
+        server, base_url = start_mock_server()
+        newsapi_base, llm_base = base_url, f"{base_url}/v1"
+        newsapi_key, llm_key = "mock-key", "mock-key"
+    
+    if not newsapi_key or not llm_key:
+        print("❌ NEWSAPI_KEY and OPENAI_API_KEY are needed (or use --mock)")
+        return False
+    
+    print(f"NewsAPI: {newsapi_base}")
+    print(f"LLM:     {llm_base}")
+    print(f"{runs} run(s) per probe, {concurrency} concurrent request(s)\n")
+    
+    probes = build_probes(newsapi_base, newsapi_key, llm_base, llm_key, llm_chat)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_probe, *probe) for probe in probes for _ in range(runs)]
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    if server:
+        server.shutdown()
+    
+    header = (f"{'probe':<28} {'ok':>5} {'dns':>7} {'connect':>8} {'tls':>7} "
+              f"{'ttfb':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'results':>8}")
+    print(header)
+    print("-" * len(header))
+    all_ok = True
+    for name, _, _ in probes:
+        results = [r for n, r in outcomes if n == name]
+        good = [r for r in results if r["ok"]]
+        all_ok = all_ok and len(good) == len(results)
+        line = f"{name:<28} {len(good):>2}/{len(results):<2}"
+        if good:
+            def median(phase):
+                return percentile([r["timings"][phase] for r in good], 50)
+            totals = [r["timings"]["total"] for r in good]
+            counts = sorted({r["count"] for r in good})
+            line += (f" {median('dns'):>7.1f} {median('connect'):>8.1f} {median('tls'):>7.1f} "
+                     f"{median('ttfb'):>7.1f} {percentile(totals, 50):>7.1f} "
+                     f"{percentile(totals, 90):>7.1f} {percentile(totals, 99):>7.1f} "
+                     f"{'/'.join(str(c) for c in counts):>8}")
+        print(line)
+        for r in results:
+            if not r["ok"]:
+                print(f"    ❌ {r.get('error') or 'HTTP ' + str(r['status'])}")
+                break
+    
+    print("\nPhase columns are medians in ms; p50/p90/p99 are total request time.")
+    print(f"Wall time: {elapsed:.2f}s for {len(outcomes)} requests")
+    return all_ok
+
 def main():
     """Run all tests"""
+    parser = argparse.ArgumentParser(description="Check and profile the News Reporter setup")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile NewsAPI and LLM endpoint latency instead of running the setup checks")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="requests per probe (default 5)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8,
+                        help="requests in flight at once (default 8)")
+    parser.add_argument("--mock", action="store_true",
+                        help="profile against the local stand-ins in mock_services.py")
+    parser.add_argument("--llm-chat", action="store_true",
+                        help="also probe a 1-token chat completion per routed model (uses tokens on real endpoints)")
+    args = parser.parse_args()
+    
     print("🚀 CrewAI News Reporter - Debug Mode")
     print("=" * 50)
     
+    if args.profile:
+        profile_endpoints(args.runs, args.concurrency, args.mock, args.llm_chat)
+        return
+    
     all_passed = True
     
     # Test 1: Environment
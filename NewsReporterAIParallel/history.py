@@ -0,0 +1,332 @@
+"""
+Report history stored as compressed Parquet tables, partitioned by day.
+
+Each run is written to six tables under HISTORY_DIR:
+    runs/        one row of metrics per run (latency, tokens, status)
+    articles/    every article the fetcher returned
+    headlines/   headlines listed by the reporters
+    sections/    "## ..." sections of the analyst summary
+    stages/      per-agent model, latency and token use
+    clusters/    story clusters of the fetched articles
+
+Files are laid out as <table>/date=YYYY-MM-DD/<run_id>.parquet, so scans
+that filter on date only open the matching days and read only the
+requested columns. Once a day is over, its per-run files are merged into
+one file per table (on the first run of a later day, or with
+`python history.py compact`), so scans don't open thousands of tiny files.
+"""
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+COMPRESSION = "zstd"
+
+SCHEMAS = {
+    "runs": pa.schema([
+        ("run_id", pa.string()),
+        ("started_at", pa.timestamp("ms")),
+        ("finished_at", pa.timestamp("ms")),
+        ("latency_s", pa.float64()),
+        ("status", pa.string()),
+        ("error", pa.string()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("total_tokens", pa.int64()),
+        ("successful_requests", pa.int64()),
+        ("article_count", pa.int32()),
+        ("headline_count", pa.int32()),
+        ("story_count", pa.int32()),
+        ("analyst_input_chars", pa.int32()),
+    ]),
+    "articles": pa.schema([
+        ("run_id", pa.string()),
+        ("query", pa.string()),
+        ("category", pa.string()),
+        ("rank", pa.int32()),
+        ("selected", pa.bool_()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("source", pa.string()),
+        ("url", pa.string()),
+        ("published_at", pa.string()),
+    ]),
+    "headlines": pa.schema([
+        ("run_id", pa.string()),
+        ("agent", pa.string()),
+        ("position", pa.int32()),
+        ("title", pa.string()),
+        ("source", pa.string()),
+        ("published_at", pa.string()),
+    ]),
+    "sections": pa.schema([
+        ("run_id", pa.string()),
+        ("position", pa.int32()),
+        ("heading", pa.string()),
+        ("body", pa.string()),
+    ]),
+    "stages": pa.schema([
+        ("run_id", pa.string()),
+        ("position", pa.int32()),
+        ("agent", pa.string()),
+        ("model", pa.string()),
+        ("outcome", pa.string()),
+        ("latency_s", pa.float64()),
+        ("over_budget", pa.bool_()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("total_tokens", pa.int64()),
+    ]),
+    "clusters": pa.schema([
+        ("run_id", pa.string()),
+        ("category", pa.string()),
+        ("position", pa.int32()),
+        ("size", pa.int32()),
+        ("title", pa.string()),
+        ("source", pa.string()),
+        ("sources", pa.list_(pa.string())),
+        ("published_at", pa.string()),
+        ("selected", pa.bool_()),
+    ]),
+}
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+# "1. Title - Source (2024-01-31)", as produced by tools.fetch_news_direct
+HEADLINE_PATTERN = re.compile(
+    r"^\s*\d+\.\s+(?P<title>.+?)\s+-\s+(?P<source>[^-]+?)(?:\s+\((?P<date>[\d-]+)\))?\s*$"
+)
+
+
+def parse_headlines(text):
+    """Extract (title, source, date) tuples from a reporter's output"""
+    headlines = []
+    for line in text.splitlines():
+        match = HEADLINE_PATTERN.match(line.replace("*", ""))
+        if match:
+            headlines.append((match["title"], match["source"], match["date"] or ""))
+    return headlines
+
+
+def parse_sections(text):
+    """Split the analyst summary into (heading, body) pairs on '## ' headings"""
+    sections = []
+    heading, body = "", []
+    for line in text.splitlines():
+        if line.startswith("## "):
+            if heading or "".join(body).strip():
+                sections.append((heading, "\n".join(body).strip()))
+            heading, body = line[3:].strip(), []
+        else:
+            body.append(line)
+    if heading or "".join(body).strip():
+        sections.append((heading, "\n".join(body).strip()))
+    return sections
+
+
+def _write(table_name, rows, day, run_id):
+    if not rows:
+        return
+    table = pa.Table.from_pylist(rows, schema=SCHEMAS[table_name])
+    directory = os.path.join(HISTORY_DIR, table_name, f"date={day}")
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(table, directory, f"{run_id}.parquet")
+
+
+def _write_atomic(table, directory, filename):
+    # Dataset scans skip dot-files, so readers never see a half-written file
+    tmp_path = os.path.join(directory, f".{filename}.tmp")
+    pq.write_table(table, tmp_path, compression=COMPRESSION)
+    os.replace(tmp_path, os.path.join(directory, filename))
+
+
+def record_run(run_id, started_at, finished_at, result=None, error=None, status=None,
+               task_outputs=(), articles=(), token_usage=None, stages=(), clusters=None,
+               analyst_input_chars=None):
+    """Write one report run to the history tables
+
+    task_outputs is a list of (agent role, output text) pairs for the
+    reporter tasks; token_usage is a dict of crewai usage metrics; stages
+    is a list of per-agent dicts matching the "stages" schema; clusters maps
+    categories to clustering.cluster_articles() output; analyst_input_chars
+    is the size of the news text given to the analyst. status defaults to
+    "succeeded", or "failed" when error is given.
+    """
+    token_usage = token_usage or {}
+    day = started_at.strftime("%Y-%m-%d")
+
+    headline_rows = []
+    for agent, text in task_outputs:
+        for position, (title, source, date) in enumerate(parse_headlines(text), 1):
+            headline_rows.append({
+                "run_id": run_id, "agent": agent, "position": position,
+                "title": title, "source": source, "published_at": date,
+            })
+
+    section_rows = [
+        {"run_id": run_id, "position": position, "heading": heading, "body": body}
+        for position, (heading, body) in enumerate(parse_sections(result or ""), 1)
+    ]
+
+    article_rows = [dict(article, run_id=run_id) for article in articles]
+    stage_rows = [dict(stage, run_id=run_id, position=position)
+                  for position, stage in enumerate(stages, 1)]
+    cluster_rows = [
+        {"run_id": run_id, "category": category, "position": position, "size": c["size"],
+         "title": c["title"], "source": c["source"], "sources": c["sources"],
+         "published_at": c["published_at"], "selected": c.get("selected", False)}
+        for category, items in (clusters or {}).items()
+        for position, c in enumerate(items, 1)
+    ]
+
+    run_row = {
+        "run_id": run_id,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "latency_s": (finished_at - started_at).total_seconds(),
+        "status": status or ("failed" if error is not None else "succeeded"),
+        "error": error,
+        "prompt_tokens": token_usage.get("prompt_tokens"),
+        "completion_tokens": token_usage.get("completion_tokens"),
+        "total_tokens": token_usage.get("total_tokens"),
+        "successful_requests": token_usage.get("successful_requests"),
+        "article_count": len(article_rows),
+        "headline_count": len(headline_rows),
+        "story_count": len(cluster_rows) if clusters is not None else None,
+        "analyst_input_chars": analyst_input_chars,
+    }
+
+    _write("articles", article_rows, day, run_id)
+    _write("headlines", headline_rows, day, run_id)
+    _write("sections", section_rows, day, run_id)
+    _write("stages", stage_rows, day, run_id)
+    _write("clusters", cluster_rows, day, run_id)
+    # Written last so a run never appears in the index without its details
+    _write("runs", [run_row], day, run_id)
+
+    global _last_day
+    if day != _last_day:
+        _last_day = day
+        try:
+            compact_closed_days(day)
+        except Exception as e:
+            print(f"DEBUG: Could not compact report history: {e}")
+
+
+def dataset(table_name):
+    """Open a history table as a lazily scanned, day-partitioned dataset"""
+    path = os.path.join(HISTORY_DIR, table_name)
+    if not os.path.isdir(path):
+        return None
+    return ds.dataset(path, format="parquet", schema=SCHEMAS[table_name].append(
+        pa.field("date", pa.string())), partitioning=PARTITIONING)
+
+
+def scan(table_name, columns=None, start_date=None, end_date=None, run_ids=None):
+    """Read selected columns of a table, pruning days outside the date range
+
+    Dates are "YYYY-MM-DD" strings and both ends are inclusive. Returns a
+    pyarrow Table (empty if nothing has been recorded yet).
+    """
+    data = dataset(table_name)
+    if data is None:
+        schema = SCHEMAS[table_name]
+        if columns:
+            schema = pa.schema([schema.field(c) for c in columns if c != "date"])
+        return schema.empty_table()
+
+    condition = None
+    if start_date:
+        condition = ds.field("date") >= start_date
+    if end_date:
+        clause = ds.field("date") <= end_date
+        condition = clause if condition is None else condition & clause
+    if run_ids is not None:
+        clause = ds.field("run_id").isin(list(run_ids))
+        condition = clause if condition is None else condition & clause
+
+    return data.to_table(columns=columns, filter=condition)
+
+
+def compact_day(day):
+    """Merge the per-run files of one day into a single file per table"""
+    for table_name in SCHEMAS:
+        directory = os.path.join(HISTORY_DIR, table_name, f"date={day}")
+        if not os.path.isdir(directory):
+            continue
+        files = sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                       if f.endswith(".parquet"))
+        if len(files) < 2:
+            continue
+        # Reading through the table schema fills columns that older files lack
+        table = ds.dataset(files, format="parquet", schema=SCHEMAS[table_name]).to_table()
+        _write_atomic(table, directory, f"compacted-{datetime.now():%H%M%S%f}.parquet")
+        for path in files:
+            os.remove(path)
+
+
+# Day of the last run this process recorded; a new day triggers compaction
+_last_day = None
+
+
+def compact_closed_days(today):
+    """Compact every day before yesterday that still has more than one file per table
+
+    Yesterday is left alone because a run started before midnight may still
+    be writing to it. A lock file keeps two processes from compacting at once.
+    """
+    cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+    days = set()
+    for table_name in SCHEMAS:
+        path = os.path.join(HISTORY_DIR, table_name)
+        if not os.path.isdir(path):
+            continue
+        for partition in os.listdir(path):
+            day = partition.removeprefix("date=")
+            if day < cutoff and sum(f.endswith(".parquet") for f in os.listdir(os.path.join(path, partition))) > 1:
+                days.add(day)
+    if not days:
+        return []
+
+    lock_path = os.path.join(HISTORY_DIR, ".compact.lock")
+    # A lock left behind by a crashed process
+    if os.path.exists(lock_path) and datetime.now().timestamp() - os.path.getmtime(lock_path) > 3600:
+        os.remove(lock_path)
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return []
+    try:
+        for day in sorted(days):
+            compact_day(day)
+    finally:
+        os.remove(lock_path)
+    return sorted(days)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["compact"]:
+        # python history.py compact [YYYY-MM-DD]: one day, or every closed day
+        if len(sys.argv) > 2:
+            compact_day(sys.argv[2])
+            print(f"Compacted {sys.argv[2]}")
+        else:
+            compacted = compact_closed_days(datetime.now().strftime("%Y-%m-%d"))
+            print(f"Compacted {len(compacted)} day(s)")
+        sys.exit()
+
+    # Quick summary of what has been recorded
+    runs = scan("runs", columns=["date", "status", "latency_s", "total_tokens"])
+    print(f"Runs recorded: {runs.num_rows}")
+    if runs.num_rows:
+        print(runs.group_by(["date", "status"]).aggregate([
+            ("latency_s", "mean"), ("total_tokens", "sum"), ("status", "count")
+        ]).sort_by("date").to_pandas().to_string(index=False))
@@ -0,0 +1,594 @@
+"""
+Shared report backend: a persistent job queue and a bounded pool of crew workers.
+
+Both the Streamlit UI (app.py) and the HTTP service (server.py) submit report
+jobs here, so they share the same agents, tasks and worker limits. Several
+processes can share one jobs.db: each claims a job with a lease that its
+heartbeat renews, and only jobs whose lease has expired (their process died)
+are put back in the queue.
+"""
+import os
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from cancellation import CancelToken, RunCancelled, DeadlineExceeded, use_token
+
+load_dotenv()
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# A running job whose lease is not renewed for this long is considered abandoned
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 4
+
+# Hard deadlines in seconds: for the whole run and for each stage
+REPORT_DEADLINE = float(os.getenv("REPORT_DEADLINE", "240"))
+REPORTER_DEADLINE = float(os.getenv("REPORTER_DEADLINE", "90"))
+ANALYST_DEADLINE = float(os.getenv("ANALYST_DEADLINE", "120"))
+STAGE_GRACE_SECONDS = 5
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+def build_crew(verbose=True):
+    """Build the news crew from the shared agents and tasks"""
+    from agents import reporter1, reporter2, analyst
+    from tasks import report_task1, report_task2, summary_task
+    from crewai import Crew
+
+    crew = Crew(
+        agents=[reporter1, reporter2, analyst],
+        tasks=[report_task1, report_task2, summary_task],
+        verbose=verbose,
+        process="sequential"
+    )
+    # Agents and tasks are module-level singletons that crewai mutates while
+    # running, so each run works on its own copy.
+    return crew.copy()
+
+
+def _token_usage(stages):
+    """Token usage of the whole run, summed over its stages"""
+    usage = {}
+    for stage in stages:
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens", "successful_requests"):
+            if stage.get(key) is not None:
+                usage[key] = usage.get(key, 0) + stage[key]
+    return usage
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return {}
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    return dict(usage)
+
+
+def _agent_token_usage(agent):
+    """Tokens used by one agent during the run, if crewai tracks them"""
+    token_process = getattr(agent, "_token_process", None)
+    if token_process is None:
+        return {}
+    return _usage_dict(token_process.get_summary())
+
+
+def _run_stages(tasks, parent_token, deadline, verbose, models):
+    """Run each task as its own single-agent crew, in parallel, under a stage deadline
+
+    models maps agent roles to the model each stage uses. Returns
+    {task: (output or None, error or None, latency_s)}. A stage that fails,
+    is cancelled or misses its deadline gets an error instead of output.
+    """
+    from crewai import Crew
+    from routing import make_llm
+
+    stage_started = {}
+
+    def run_stage(task, token):
+        started = stage_started[task] = time.monotonic()
+        try:
+            with use_token(token):
+                # A fresh client per stage, whose request timeout ends with the stage
+                task.agent.llm = make_llm(models[task.agent.role], timeout=token.remaining())
+                crew = Crew(agents=[task.agent], tasks=[task], verbose=verbose, process="sequential")
+                output = crew.kickoff()
+            return output, None, time.monotonic() - started
+        except Exception as e:
+            return None, e, time.monotonic() - started
+
+    tokens = {task: parent_token.child(deadline, name=task.agent.role) for task in tasks}
+    pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="report-stage")
+    futures = {task: pool.submit(contextvars.copy_context().run, run_stage, task, tokens[task])
+               for task in tasks}
+    # Stages raise as soon as their token expires; don't wait on one that hangs regardless
+    pool.shutdown(wait=False)
+
+    submitted = time.monotonic()
+    outcomes = {}
+    for task, future in futures.items():
+        remaining = tokens[task].remaining()
+        try:
+            outcomes[task] = future.result(
+                timeout=None if remaining is None else remaining + STAGE_GRACE_SECONDS)
+        except FutureTimeout:
+            tokens[task].cancel("Stage did not stop at its deadline")
+            outcomes[task] = (None, DeadlineExceeded(f"{task.agent.role} missed its deadline"),
+                              time.monotonic() - stage_started.get(task, submitted))
+    return outcomes
+
+
+def run_report(verbose=True, on_event=None, run_id=None, token=None,
+               deadline=REPORT_DEADLINE):
+    """Run the crew once and record the run in the report history
+
+    The reporters run in parallel, each with REPORTER_DEADLINE; the analyst
+    then summarizes whatever they produced within ANALYST_DEADLINE. A stage
+    that misses its deadline or fails makes the report partial instead of
+    failing the run. Cancelling token (or Ctrl+C) abandons in-flight work and
+    raises RunCancelled; see routing.CancellableLLM for what that means for
+    LLM calls.
+
+    on_event(event, data) is called with stage progress. Returns the final
+    report text.
+    """
+    import history
+    from agents import AGENT_ROUTES
+    from clustering import cluster_by_category
+    from routing import router
+    from tasks import REPORT_CATEGORIES, summary_inputs, fallback_report, missing_reason
+    from tools import capture_articles
+
+    run_id = run_id or uuid.uuid4().hex
+    token = token or CancelToken()
+    report_token = token.child(deadline, name="report")
+
+    def emit(event, data):
+        if on_event:
+            on_event(event, data)
+
+    crew = build_crew(verbose=verbose)
+    models = {agent.role: router.choose(AGENT_ROUTES[agent.role]) for agent in crew.agents}
+    *reporter_tasks, summary = crew.tasks
+
+    stages = []
+
+    def record_stage(task, output, error, latency_s):
+        role = task.agent.role
+        tokens = _agent_token_usage(task.agent)
+        if error is None:
+            outcome = "completed"
+        elif isinstance(error, DeadlineExceeded):
+            outcome = "timed_out"
+        else:
+            outcome = "cancelled" if isinstance(error, RunCancelled) else "failed"
+        # Cancelled and failed stages say nothing about the model's latency; they
+        # are kept for their token use but left out of routing and latency stats
+        timed = outcome in ("completed", "timed_out")
+        over_budget = router.record(AGENT_ROUTES[role], models[role], latency_s, tokens) if timed else None
+        stages.append({
+            "agent": role, "model": models[role], "outcome": outcome,
+            "latency_s": latency_s if timed else None,
+            "over_budget": over_budget,
+            "prompt_tokens": tokens.get("prompt_tokens"),
+            "completion_tokens": tokens.get("completion_tokens"),
+            "total_tokens": tokens.get("total_tokens"),
+        })
+        if error is None:
+            emit("stage_completed", {"agent": role, "model": models[role], "latency_s": latency_s})
+        else:
+            print(f"DEBUG: {role} did not finish: {error}")
+            emit("stage_missed", {"agent": role, "model": models[role], "reason": str(error),
+                                  "timed_out": isinstance(error, DeadlineExceeded)})
+
+    started_at = datetime.now()
+    result, error, status = None, None, "succeeded"
+    reports, missing, clusters = {}, {}, None
+    analyst_input = None
+    with capture_articles() as articles:
+        try:
+            for task in reporter_tasks:
+                emit("stage_started", {"agent": task.agent.role})
+            outcomes = _run_stages(reporter_tasks, report_token, REPORTER_DEADLINE, verbose, models)
+            for task in reporter_tasks:
+                output, stage_error, latency_s = outcomes[task]
+                record_stage(task, output, stage_error, latency_s)
+                if stage_error is None:
+                    reports[task.agent.role] = str(output)
+                else:
+                    missing[task.agent.role] = missing_reason(stage_error)
+            token.raise_if_cancelled()
+
+            if not reports:
+                raise RuntimeError("No reporter finished: " + "; ".join(
+                    f"{role} {reason}" for role, reason in missing.items()))
+
+            # Story lines for the reporters' picks and the largest stories replace
+            # the headline lists, so the analyst's prompt does not grow with the
+            # number of candidates fetched
+            finished = {REPORT_CATEGORIES[role] for role in reports}
+            clusters = cluster_by_category([a for a in list(articles) if a.get("category") in finished])
+
+            # The analyst gets the finished reports directly, not via task context
+            summary.context = []
+            analyst_input = summary_inputs(reports, missing, clusters)
+            summary.description += analyst_input
+            emit("clusters", {"stories": {category: len(items) for category, items in clusters.items()},
+                              "analyst_input_chars": len(analyst_input)})
+            emit("stage_started", {"agent": summary.agent.role})
+            output, stage_error, latency_s = _run_stages(
+                [summary], report_token, ANALYST_DEADLINE, verbose, models)[summary]
+            record_stage(summary, output, stage_error, latency_s)
+            token.raise_if_cancelled()
+
+            if stage_error is None:
+                result = str(output)
+            else:
+                # Degrade to the reporters' own headlines rather than no report
+                result = fallback_report(reports, missing)
+                missing[summary.agent.role] = missing_reason(stage_error)
+
+            if missing:
+                status = "partial"
+                notice = "; ".join(f"{role} {reason}" for role, reason in missing.items())
+                result = f"> ⚠️ **Partial report**: {notice}.\n\n{result}"
+                emit("partial", {"missing": missing})
+            return result
+        except KeyboardInterrupt:
+            token.cancel("Interrupted")
+            error, status = "Interrupted", "cancelled"
+            raise
+        except RunCancelled as e:
+            error, status = str(e), "cancelled"
+            raise
+        except Exception as e:
+            error, status = str(e), "failed"
+            raise
+        finally:
+            try:
+                history.record_run(
+                    run_id, started_at, datetime.now(),
+                    result=result, error=error, status=status,
+                    task_outputs=list(reports.items()),
+                    articles=articles,
+                    token_usage=_token_usage(stages),
+                    stages=stages,
+                    clusters=clusters,
+                    analyst_input_chars=len(analyst_input) if analyst_input is not None else None
+                )
+            except Exception as e:
+                print(f"DEBUG: Could not record report history: {e}")
+
+
+class JobStore:
+    """SQLite-backed job queue; survives restarts of the service
+
+    worker_id identifies this process in the claimed_by column of the jobs it
+    runs.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH, worker_id=None):
+        self.path = path
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets the other processes read while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    claimed_by TEXT,
+                    lease_expires_at REAL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Queues created before leases were added
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in (("claimed_by", "TEXT"), ("lease_expires_at", "REAL"),
+                                       ("cancel_requested", "INTEGER NOT NULL DEFAULT 0")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_events_job ON job_events (job_id, seq)"
+            )
+
+    def submit(self, params=None):
+        """Queue a new job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params or {}), now)
+            )
+        self.add_event(job_id, "status", {"status": QUEUED})
+        return job_id
+
+    def claim_next(self):
+        """Atomically move the oldest queued job to running under this worker's lease"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, claimed_by = ?, lease_expires_at = ?"
+                " WHERE id = ? AND status = ?",
+                (RUNNING, now, self.worker_id, time.time() + JOB_LEASE_SECONDS, row["id"], QUEUED)
+            )
+            if cursor.rowcount == 0:
+                return None
+        self.add_event(row["id"], "status", {"status": RUNNING})
+        return self.get(row["id"])
+
+    def finish(self, job_id, result=None, error=None, status=None):
+        """Store the outcome of a job this worker holds; returns False if its lease was lost"""
+        status = status or (FAILED if error is not None else SUCCEEDED)
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?,"
+                " lease_expires_at = NULL WHERE id = ? AND status = ? AND claimed_by = ?",
+                (status, result, error, now, job_id, RUNNING, self.worker_id)
+            )
+        if cursor.rowcount == 0:
+            print(f"DEBUG: Lost the lease on job {job_id}; not recording its outcome")
+            return False
+        self.add_event(job_id, "status", {"status": status, "error": error})
+        return True
+
+    def renew_leases(self, job_ids):
+        """Extend this worker's leases; returns (ids still held, ids asked to cancel)"""
+        if not job_ids:
+            return set(), set()
+        placeholders = ", ".join("?" * len(job_ids))
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE status = ? AND claimed_by = ?"
+                f" AND id IN ({placeholders})",
+                (time.time() + JOB_LEASE_SECONDS, RUNNING, self.worker_id, *job_ids)
+            )
+            rows = self._conn.execute(
+                f"SELECT id, cancel_requested FROM jobs WHERE status = ? AND claimed_by = ?"
+                f" AND id IN ({placeholders})",
+                (RUNNING, self.worker_id, *job_ids)
+            ).fetchall()
+        return ({row["id"] for row in rows},
+                {row["id"] for row in rows if row["cancel_requested"]})
+
+    def request_cancel(self, job_id):
+        """Ask whichever worker runs a job to stop it; returns False if it is not running"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                (job_id, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def cancel_queued(self, job_id):
+        """Cancel a job that has not started yet; returns False if it already has"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, "Cancelled before it started", now, job_id, QUEUED)
+            )
+        if cursor.rowcount == 0:
+            return False
+        self.add_event(job_id, "status", {"status": CANCELLED})
+        return True
+
+    def requeue_expired(self):
+        """Put running jobs whose lease expired back in the queue; returns their ids
+
+        Jobs that were asked to cancel are marked cancelled instead. Running
+        jobs without a lease come from a queue created before leases existed.
+        """
+        now = time.time()
+        expired = "status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT id, cancel_requested FROM jobs WHERE {expired}", (RUNNING, now)
+            ).fetchall()
+            self._conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL"
+                f" WHERE {expired} AND cancel_requested = 1",
+                (CANCELLED, "Cancelled by user", datetime.now().isoformat(), RUNNING, now)
+            )
+            self._conn.execute(
+                f"UPDATE jobs SET status = ?, started_at = NULL, claimed_by = NULL,"
+                f" lease_expires_at = NULL WHERE {expired}",
+                (QUEUED, RUNNING, now)
+            )
+        requeued = []
+        for row in rows:
+            if row["cancel_requested"]:
+                self.add_event(row["id"], "status", {"status": CANCELLED})
+            else:
+                self.add_event(row["id"], "status", {"status": QUEUED, "reason": "lease expired"})
+                requeued.append(row["id"])
+        return requeued
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def add_event(self, job_id, event, data):
+        """Append a progress event for a job"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, created_at, event, data) VALUES (?, ?, ?, ?)",
+                (job_id, now, event, json.dumps(data))
+            )
+
+    def events_since(self, job_id, after_seq=0):
+        """Return the events of a job with a sequence number above after_seq"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [
+            {"seq": row["seq"], "created_at": row["created_at"],
+             "event": row["event"], "data": json.loads(row["data"])}
+            for row in rows
+        ]
+
+
+class JobRunner:
+    """Bounded pool of worker threads that run crews for queued jobs"""
+
+    def __init__(self, store=None, workers=REPORT_WORKERS):
+        self.store = store or JobStore()
+        self.workers = workers
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._tokens = {}
+        self._tokens_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads and the lease heartbeat"""
+        if self._threads:
+            return
+        self._requeue_expired()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"report-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="report-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Ask workers to exit once their current job is done"""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, params=None):
+        """Queue a report job and wake an idle worker"""
+        job_id = self.store.submit(params)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or stop a running one; returns False if unknown or finished"""
+        if self.store.cancel_queued(job_id):
+            return True
+        with self._tokens_lock:
+            token = self._tokens.get(job_id)
+        if token is not None:
+            token.cancel("Cancelled by user")
+            return True
+        # Running in another process: its heartbeat picks up the request
+        return self.store.request_cancel(job_id)
+
+    def _requeue_expired(self):
+        requeued = self.store.requeue_expired()
+        if requeued:
+            print(f"DEBUG: Re-queued {len(requeued)} job(s) whose worker stopped responding")
+            with self._wakeup:
+                self._wakeup.notify_all()
+
+    def _heartbeat(self):
+        """Renew the leases of this process's jobs and apply cancel requests from others"""
+        while not self._stopping.wait(HEARTBEAT_SECONDS):
+            try:
+                with self._tokens_lock:
+                    tokens = dict(self._tokens)
+                held, cancel_requested = self.store.renew_leases(list(tokens))
+                for job_id, token in tokens.items():
+                    if job_id in cancel_requested:
+                        token.cancel("Cancelled by user")
+                    elif job_id not in held:
+                        # Requeued after a stall; another worker owns it now
+                        token.cancel("Lost the job lease")
+                self._requeue_expired()
+            except sqlite3.Error as e:
+                print(f"DEBUG: Job heartbeat failed: {e}")
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                with self._wakeup:
+                    # Polling as well as waiting picks up jobs queued or requeued by other processes
+                    self._wakeup.wait(timeout=2)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job):
+        job_id = job["id"]
+        params = job["params"]
+
+        token = CancelToken()
+        with self._tokens_lock:
+            self._tokens[job_id] = token
+
+        def on_event(event, data):
+            self.store.add_event(job_id, event, data)
+
+        try:
+            result = run_report(verbose=params.get("verbose", False), on_event=on_event,
+                                run_id=job_id, token=token,
+                                deadline=float(params.get("deadline") or REPORT_DEADLINE))
+            self.store.finish(job_id, result=result)
+        except RunCancelled as e:
+            self.store.finish(job_id, error=str(e), status=CANCELLED)
+        except Exception as e:
+            print(f"DEBUG: Job {job_id} failed: {e}")
+            self.store.finish(job_id, error=str(e))
+        finally:
+            with self._tokens_lock:
+                self._tokens.pop(job_id, None)
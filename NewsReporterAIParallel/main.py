@@ -1,8 +1,7 @@
 import os
 from dotenv import load_dotenv
-from agents import reporter1, reporter2, analyst
-from tasks import report_task1, report_task2, summary_task
-from crewai import Crew
+from jobs import run_report
+from cancellation import RunCancelled
 
 # Load environment variables
 load_dotenv()
@@ -25,22 +24,16 @@ def main():
     print("=" * 50)
     
     try:
-        # Create the crew
-        crew = Crew(
-            agents=[reporter1, reporter2, analyst],
-            tasks=[report_task1, report_task2, summary_task],
-            verbose=True,  # Logs agent reasoning and tool usage
-            process="sequential"  # Tasks execute in order
-        )
-        
-        # Execute the crew
-        result = crew.kickoff()
+        # Create and execute the crew; the run is saved to the report history
+        result = run_report(verbose=True)  # Logs agent reasoning and tool usage
         
         print("\n" + "=" * 50)
         print("NEWS SUMMARY COMPLETED")
         print("=" * 50)
         print(result)
         
+    except (KeyboardInterrupt, RunCancelled):
+        print("\nReport cancelled.")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
         print("Please check your API keys and internet connection.")
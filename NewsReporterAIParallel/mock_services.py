@@ -0,0 +1,148 @@
+"""
+Local stand-ins for NewsAPI and an OpenAI-compatible LLM endpoint.
+
+Responses are deterministic, so diagnostics and crew runs against the mock
+are reproducible and cost nothing. Point the app at it with:
+    NEWSAPI_BASE_URL=http://127.0.0.1:<port>
+    OPENAI_API_BASE=http://127.0.0.1:<port>/v1
+
+Run standalone with: python mock_services.py [port]
+"""
+import sys
+import json
+import time
+import threading
+import hashlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MOCK_REPORT = """Thought: I now know the final answer
+Final Answer: 1. Mock headline one - Mock Source (2024-01-01)
+2. Mock headline two - Mock Source (2024-01-01)
+3. Mock headline three - Mock Source (2024-01-01)"""
+
+TOPIC_WORDS = {
+    "politics": ["government", "minister", "parliament", "election", "policy", "cabinet"],
+    "tech": ["AI", "startup", "software", "technology", "innovation", "app"],
+}
+
+
+def mock_articles(query, domains, count):
+    """Deterministic articles for a query; the same input gives the same output"""
+    topic = "politics" if any(w in query for w in ("India", "BJP", "political")) else "tech"
+    words = TOPIC_WORDS[topic]
+    sources = [d.split(".")[0].title() for d in domains.split(",") if d] or ["Mock News"]
+    seed = int(hashlib.md5(query.encode()).hexdigest(), 16)
+    now = datetime(2024, 1, 1, 12, 0, 0)
+
+    articles = []
+    for i in range(count):
+        word = words[(seed + i) % len(words)]
+        source = sources[(seed + i) % len(sources)]
+        articles.append({
+            "source": {"id": None, "name": source},
+            "author": "Mock Reporter",
+            "title": f"{word.title()} update {i + 1}: {query[:40]} - {source}",
+            "description": f"Mock {topic} story about {word} ({i + 1}).",
+            "url": f"https://example.com/{topic}/{seed % 10000}/{i + 1}",
+            "publishedAt": (now - timedelta(minutes=17 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "content": f"Mock content about {word}.",
+        })
+    return articles
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    # Extra delay per chat model, e.g. {"mock-strong": 5.0} to trigger routing fallbacks
+    model_latency = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path in ("/v2/everything", "/v2/top-headlines"):
+            if not params.get("apiKey"):
+                self._send_json({"status": "error", "code": "apiKeyMissing"}, status=401)
+                return
+            count = min(int(params.get("pageSize", 20)), 100)
+            query = params.get("q") or params.get("country", "")
+            articles = mock_articles(query, params.get("domains", ""), count)
+            self._send_json({"status": "ok", "totalResults": count * 10, "articles": articles})
+        elif url.path == "/v1/models":
+            self._send_json({"object": "list", "data": [
+                {"id": "mock-fast", "object": "model"},
+                {"id": "mock-strong", "object": "model"},
+            ]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if urlparse(self.path).path == "/v1/chat/completions":
+            time.sleep(self.model_latency.get(request.get("model"), 0.0))
+            prompt_tokens = sum(len(str(m.get("content", "")).split())
+                                for m in request.get("messages", []))
+            completion_tokens = len(MOCK_REPORT.split())
+            self._send_json({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": MOCK_REPORT},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+class MockServer(ThreadingHTTPServer):
+    # Diagnostics fire many concurrent connections; the default backlog of 5
+    # makes some of them wait for a SYN retry and skews the percentiles.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_mock_server(port=0, latency=0.0, model_latency=None):
+    """Start the mock on a background thread and return (server, base_url)"""
+    handler = type("ConfiguredMockHandler", (MockHandler,),
+                   {"latency": latency, "model_latency": model_latency or {}})
+    server = MockServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8001
+    server, base_url = start_mock_server(port)
+    print(f"Mock NewsAPI: {base_url}  (NEWSAPI_BASE_URL={base_url})")
+    print(f"Mock LLM:     {base_url}/v1  (OPENAI_API_BASE={base_url}/v1)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,209 @@
+"""
+Vectorized relevance ranking for candidate articles.
+
+All candidates of a fetch are turned into one sparse TF-IDF matrix and
+scored in a single pass on relevance to the category profile, recency and
+source diversity. The top-N are then picked with Maximal Marginal
+Relevance (MMR), so near-duplicate stories and repeated sources are pushed
+down the list.
+
+Run `python ranking.py` for a sanity check and a benchmark on synthetic
+candidates.
+"""
+import re
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy import sparse
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or that the
+    this to was were will with after over new says said
+""".split())
+
+# Weights of the base score; they sum to 1
+RELEVANCE_WEIGHT = 0.6
+RECENCY_WEIGHT = 0.25
+SOURCE_WEIGHT = 0.15
+RECENCY_HALF_LIFE_HOURS = 24.0
+# MMR trade-off between score (1.0) and novelty (0.0)
+MMR_LAMBDA = 0.7
+# Only the best candidates by base score go through the (sequential) MMR step
+MMR_POOL = 100
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def tfidf_matrix(texts, extra_texts=()):
+    """L2-normalized TF-IDF rows for texts, plus rows for extra_texts
+
+    extra_texts (e.g. a category profile) share the vocabulary and IDF of
+    texts but do not count towards document frequency.
+    """
+    vocabulary = {}
+    all_texts = list(texts) + list(extra_texts)
+    indptr = np.zeros(len(all_texts) + 1, dtype=np.int64)
+    indices = []
+    for i, text in enumerate(all_texts):
+        ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text)]
+        indices.extend(ids)
+        indptr[i + 1] = len(indices)
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64), indptr),
+        shape=(len(all_texts), max(len(vocabulary), 1))
+    )
+    counts.sum_duplicates()
+
+    n_docs = len(texts)
+    doc_freq = np.bincount(counts[:n_docs].indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_docs) / (1 + doc_freq)).astype(np.float32) + 1
+    # Sublinear term frequency keeps repeated words from dominating
+    counts.data = 1 + np.log(counts.data)
+    weighted = counts.multiply(idf).tocsr()
+
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    normalized = sparse.diags(1 / norms) @ weighted
+    return normalized[:n_docs].tocsr(), normalized[n_docs:].tocsr()
+
+
+def published_hours_ago(articles, now=None):
+    """Age of each article in hours; unparseable dates count as very old"""
+    now = np.datetime64((now or datetime.now(timezone.utc)).replace(tzinfo=None), "s")
+    stamps = [(article.get("publishedAt") or "")[:19] for article in articles]
+    try:
+        published = np.array(stamps, dtype="datetime64[s]")
+    except ValueError:
+        published = np.array([_parse_stamp(s) for s in stamps], dtype="datetime64[s]")
+    hours = (now - published).astype(np.float64) / 3600
+    # NaT does not cast to NaN but to a huge negative number, so mask it first
+    hours[np.isnat(published)] = 24 * 365
+    return np.clip(hours, 0, None)
+
+
+def _parse_stamp(stamp):
+    try:
+        return np.datetime64(stamp, "s")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def score_articles(articles, profile_terms, now=None):
+    """Base score of every article, plus the TF-IDF rows used for MMR
+
+    Relevance is the cosine similarity to the profile, recency decays with
+    RECENCY_HALF_LIFE_HOURS, and source diversity favours sources with few
+    candidates in the batch.
+    """
+    texts = [f"{a.get('title') or ''} {a.get('description') or ''}" for a in articles]
+    vectors, profile = tfidf_matrix(texts, [" ".join(profile_terms)])
+
+    relevance = (vectors @ profile.T).toarray().ravel()
+    if relevance.max() > 0:
+        relevance /= relevance.max()
+
+    recency = np.exp2(-published_hours_ago(articles, now) / RECENCY_HALF_LIFE_HOURS)
+
+    sources = np.array([(a.get("source") or {}).get("name") or "" for a in articles], dtype=object)
+    _, source_ids, source_counts = np.unique(sources, return_inverse=True, return_counts=True)
+    source_rarity = 1 / source_counts[source_ids]
+
+    score = (RELEVANCE_WEIGHT * relevance + RECENCY_WEIGHT * recency
+             + SOURCE_WEIGHT * source_rarity)
+    return score, vectors, source_ids
+
+
+def rank_articles(articles, profile_terms, top_n=3, now=None):
+    """Best top_n articles for a category, in order, without repeating a story"""
+    if len(articles) <= 1:
+        return list(articles)[:top_n]
+
+    score, vectors, source_ids = score_articles(articles, profile_terms, now)
+
+    pool_size = min(len(articles), max(MMR_POOL, top_n))
+    pool = np.argpartition(-score, pool_size - 1)[:pool_size]
+    pool_vectors = vectors[pool]
+    pool_score = score[pool]
+    pool_sources = source_ids[pool]
+
+    selected = []
+    max_similarity = np.zeros(pool_size)
+    seen_source = np.zeros(pool_size, dtype=bool)
+    available = np.ones(pool_size, dtype=bool)
+    for _ in range(min(top_n, pool_size)):
+        mmr = (MMR_LAMBDA * pool_score - (1 - MMR_LAMBDA) * max_similarity
+               - SOURCE_WEIGHT * seen_source)
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        similarity = (pool_vectors @ pool_vectors[best].T).toarray().ravel()
+        np.maximum(max_similarity, similarity, out=max_similarity)
+        seen_source |= pool_sources == pool_sources[best]
+
+    return [articles[pool[i]] for i in selected]
+
+
+def _synthetic_articles(count, seed=0):
+    """Random candidates with repeated stories and skewed sources, for benchmarking"""
+    rng = np.random.default_rng(seed)
+    words = np.array(("government minister election parliament policy cabinet court budget "
+                      "startup software ai chip cloud robot launch funding market city rain "
+                      "cricket film festival health school river border trade energy").split())
+    sources = [f"Source {i}" for i in range(40)]
+    now = datetime.now(timezone.utc)
+    articles = []
+    for i in range(count):
+        story = rng.choice(words, size=8)
+        articles.append({
+            "title": " ".join(story[:6]).title(),
+            "description": " ".join(rng.choice(words, size=20)),
+            "source": {"name": sources[min(int(rng.exponential(6)), 39)]},
+            "publishedAt": np.datetime_as_string(
+                np.datetime64(now.replace(tzinfo=None), "s") - np.timedelta64(int(rng.integers(0, 72 * 3600)), "s")
+            ) + "Z",
+        })
+    return articles
+
+
+def check():
+    """Regression checks for scoring edge cases; raises AssertionError on failure"""
+    now = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    hours = published_hours_ago(
+        [{"publishedAt": "2024-01-01T12:00:00Z"}, {"publishedAt": ""}, {}, {"publishedAt": "not a date"}], now)
+    assert hours[0] == 12, hours
+    assert (hours[1:] == 24 * 365).all(), f"missing dates must count as very old: {hours}"
+
+    # An undated copy of a story must not outrank the dated one on recency
+    articles = [
+        {"title": "Parliament passes budget", "source": {"name": "A"}, "publishedAt": "2024-01-01T23:00:00Z"},
+        {"title": "Parliament passes budget", "source": {"name": "B"}},
+    ]
+    score, _, _ = score_articles(articles, ["parliament", "budget"], now)
+    assert score[0] > score[1], score
+    print("ranking checks passed")
+
+
+def benchmark(sizes=(1_000, 10_000, 50_000), top_n=3, repeat=3):
+    """Time rank_articles on synthetic batches of increasing size"""
+    profile = "government politics political minister election parliament policy cabinet".split()
+    print(f"{'candidates':>10} {'best ms':>9} {'us/article':>11}")
+    for size in sizes:
+        articles = _synthetic_articles(size)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rank_articles(articles, profile, top_n=top_n)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{size:>10,} {best * 1000:>9.1f} {best / size * 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    check()
+    benchmark()
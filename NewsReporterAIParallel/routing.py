@@ -0,0 +1,156 @@
+"""
+Per-agent model routing with latency budgets.
+
+Each agent has a route: the model it normally uses, a faster fallback model
+(None when it already uses the fastest) and a latency budget for its stage.
+When a stage takes longer than its budget, the agent is switched to the
+fallback for the next FALLBACK_RUNS runs and then tries its normal model
+again. The slow run itself is not switched; its stage deadline (jobs.py)
+is what bounds it.
+
+Models are served by any OpenAI-compatible endpoint (OPENAI_API_BASE), so
+mock_services.py can stand in for OpenAI.
+"""
+import os
+import threading
+
+from crewai import LLM
+from dotenv import load_dotenv
+
+from cancellation import current_token, run_cancellable
+
+load_dotenv()
+
+FAST_MODEL = os.getenv("FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("STRONG_MODEL", "gpt-4o")
+REPORTER_LATENCY_BUDGET = float(os.getenv("REPORTER_LATENCY_BUDGET", "30"))
+ANALYST_LATENCY_BUDGET = float(os.getenv("ANALYST_LATENCY_BUDGET", "60"))
+FALLBACK_RUNS = int(os.getenv("FALLBACK_RUNS", "3"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+
+
+def _route(model, fallback, latency_budget):
+    # Falling back to the same model would change nothing
+    return {"model": model, "fallback": fallback if fallback != model else None,
+            "latency_budget": latency_budget}
+
+
+# Reporters only call a tool and format its output; the analyst does the reasoning.
+# With the defaults the reporters already use FAST_MODEL and have no fallback.
+ROUTES = {
+    "politics_reporter": _route(os.getenv("POLITICS_REPORTER_MODEL", FAST_MODEL),
+                                FAST_MODEL, REPORTER_LATENCY_BUDGET),
+    "tech_reporter": _route(os.getenv("TECH_REPORTER_MODEL", FAST_MODEL),
+                            FAST_MODEL, REPORTER_LATENCY_BUDGET),
+    "analyst": _route(os.getenv("ANALYST_MODEL", STRONG_MODEL),
+                      os.getenv("ANALYST_FALLBACK_MODEL", FAST_MODEL), ANALYST_LATENCY_BUDGET),
+}
+
+
+class CancellableLLM(LLM):
+    """LLM whose calls return as soon as the current run or stage is cancelled
+
+    A cancelled call is abandoned, not stopped: its HTTP request runs on until
+    the request timeout, which each call caps at the time left before the
+    current deadline.
+    """
+
+    def call(self, *args, **kwargs):
+        token = current_token()
+        remaining = token.remaining() if token is not None else None
+        if remaining is not None:
+            self.timeout = max(1.0, min(LLM_TIMEOUT, remaining))
+        return run_cancellable(super().call, *args, **kwargs)
+
+
+def make_llm(model, timeout=None):
+    """LLM client for a model on the configured OpenAI-compatible endpoint
+
+    timeout (seconds, at most LLM_TIMEOUT) bounds each request; pass the
+    time left before the stage deadline so abandoned calls end with it.
+    """
+    base_url = os.getenv("OPENAI_API_BASE")
+    # litellm needs the openai/ prefix to send any model name to OPENAI_API_BASE,
+    # including Hugging Face style names ("Qwen/Qwen2.5-7B-Instruct") served by vLLM or TGI.
+    # Without a custom endpoint, a slash means the name already has a provider prefix.
+    if not model.startswith("openai/") and (base_url or "/" not in model):
+        model = f"openai/{model}"
+    llm = CancellableLLM(
+        model=model,
+        base_url=base_url,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=max(1.0, min(LLM_TIMEOUT, timeout)) if timeout is not None else LLM_TIMEOUT
+    )
+    if not isinstance(llm, CancellableLLM):
+        # crewai 1.x builds its native provider client instead of the subclass
+        print(f"DEBUG: crewai returned {type(llm).__name__} for {model}; Cancel will not "
+              "interrupt its calls, only the request timeout bounds them")
+    return llm
+
+
+class ModelRouter:
+    """Chooses a model per agent and tracks per-agent latency and token use"""
+
+    def __init__(self, routes=ROUTES, fallback_runs=FALLBACK_RUNS):
+        self.routes = routes
+        self.fallback_runs = fallback_runs
+        self._lock = threading.Lock()
+        self._fallback_left = {name: 0 for name in routes}
+        self._stats = {name: {} for name in routes}
+
+    def choose(self, route_name):
+        """Model to use for the next run of an agent"""
+        route = self.routes[route_name]
+        with self._lock:
+            if route["fallback"] and self._fallback_left[route_name] > 0:
+                self._fallback_left[route_name] -= 1
+                return route["fallback"]
+        return route["model"]
+
+    def record(self, route_name, model, latency_s, tokens=None):
+        """Record one stage; going over budget routes the next runs (not this one) to the fallback"""
+        route = self.routes[route_name]
+        over_budget = latency_s > route["latency_budget"]
+        with self._lock:
+            stats = self._stats[route_name].setdefault(model, {
+                "runs": 0, "over_budget": 0, "latency_s": 0.0, "total_tokens": 0, "last_latency_s": None
+            })
+            stats["runs"] += 1
+            stats["latency_s"] += latency_s
+            stats["total_tokens"] += (tokens or {}).get("total_tokens") or 0
+            stats["last_latency_s"] = latency_s
+            if over_budget:
+                stats["over_budget"] += 1
+                if route["fallback"] and model != route["fallback"]:
+                    self._fallback_left[route_name] = self.fallback_runs
+        if over_budget:
+            print(f"DEBUG: {route_name} took {latency_s:.1f}s on {model} "
+                  f"(budget {route['latency_budget']:.0f}s)")
+        return over_budget
+
+    def metrics(self):
+        """Per-agent, per-model averages since startup"""
+        with self._lock:
+            result = {}
+            for route_name, models in self._stats.items():
+                result[route_name] = {
+                    "model": self.routes[route_name]["model"],
+                    "fallback": self.routes[route_name]["fallback"],
+                    "latency_budget": self.routes[route_name]["latency_budget"],
+                    "fallback_runs_left": self._fallback_left[route_name],
+                    "by_model": {
+                        model: {
+                            "runs": s["runs"],
+                            "over_budget": s["over_budget"],
+                            "avg_latency_s": s["latency_s"] / s["runs"],
+                            "last_latency_s": s["last_latency_s"],
+                            "avg_total_tokens": s["total_tokens"] / s["runs"],
+                        }
+                        for model, s in models.items()
+                    },
+                }
+            return result
+
+
+router = ModelRouter()
@@ -0,0 +1,186 @@
+"""
+Async HTTP service for requesting news reports programmatically.
+
+Endpoints:
+    POST /reports              queue a report, returns {"job_id": ...}
+    GET  /reports/{id}         job status
+    GET  /reports/{id}/result  report text once the job has finished
+    GET  /reports/{id}/events  progress as Server-Sent Events
+    POST /reports/{id}/cancel  stop a queued or running job
+    GET  /metrics              per-agent model routing and latency stats
+    GET  /health               liveness check
+
+Run with: python server.py
+"""
+import os
+import json
+import asyncio
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from jobs import JobRunner, FINISHED_STATES, SUCCEEDED, CANCELLED
+from routing import router
+
+load_dotenv()
+
+SERVER_HOST = os.getenv("REPORT_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("REPORT_SERVER_PORT", "8080"))
+SSE_POLL_SECONDS = 1.0
+
+RUNNER_KEY = web.AppKey("runner", JobRunner)
+
+
+def job_status(job):
+    """Public view of a job, without the report body"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "params": job["params"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+async def get_job_or_404(request):
+    store = request.app[RUNNER_KEY].store
+    job = await asyncio.to_thread(store.get, request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "job not found"}),
+                               content_type="application/json")
+    return job
+
+
+async def submit_report(request):
+    """Queue a new report job"""
+    params = {}
+    if request.can_read_body:
+        try:
+            params = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON"}),
+                                     content_type="application/json")
+    if not isinstance(params, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body must be a JSON object"}),
+                                 content_type="application/json")
+    deadline = params.get("deadline")
+    # bool is a subclass of int, so true would otherwise pass as 1 second
+    if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                 or deadline <= 0):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "deadline must be a positive number of seconds"}),
+                                 content_type="application/json")
+
+    runner = request.app[RUNNER_KEY]
+    job_id = await asyncio.to_thread(runner.submit, params)
+    return web.json_response({"job_id": job_id, "status_url": f"/reports/{job_id}"},
+                             status=202)
+
+
+async def report_status(request):
+    """Return the status of a job"""
+    job = await get_job_or_404(request)
+    return web.json_response(job_status(job))
+
+
+async def report_result(request):
+    """Return the report once the job has finished"""
+    job = await get_job_or_404(request)
+    if job["status"] not in FINISHED_STATES:
+        return web.json_response(job_status(job), status=409)
+    if job["status"] == CANCELLED:
+        # Cancelled by a client: there will never be a result, but nothing went wrong
+        return web.json_response(job_status(job), status=410)
+    if job["status"] != SUCCEEDED:
+        return web.json_response(job_status(job), status=500)
+    return web.json_response({"job_id": job["id"], "result": job["result"]})
+
+
+async def cancel_report(request):
+    """Cancel a queued job or stop a running one"""
+    job = await get_job_or_404(request)
+    runner = request.app[RUNNER_KEY]
+    if job["status"] in FINISHED_STATES or not await asyncio.to_thread(runner.cancel, job["id"]):
+        return web.json_response(job_status(job), status=409)
+    job = await asyncio.to_thread(runner.store.get, job["id"])
+    return web.json_response(job_status(job), status=202)
+
+
+async def report_events(request):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    job = await get_job_or_404(request)
+    store = request.app[RUNNER_KEY].store
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+    })
+    await response.prepare(request)
+
+    try:
+        last_seq = int(request.headers.get("Last-Event-ID", 0))
+    except ValueError:
+        last_seq = 0
+    while True:
+        events = await asyncio.to_thread(store.events_since, job["id"], last_seq)
+        for event in events:
+            last_seq = event["seq"]
+            payload = json.dumps({"created_at": event["created_at"], **event["data"]})
+            await response.write(
+                f"id: {event['seq']}\nevent: {event['event']}\ndata: {payload}\n\n".encode()
+            )
+
+        job = await asyncio.to_thread(store.get, job["id"])
+        if job["status"] in FINISHED_STATES:
+            break
+        await asyncio.sleep(SSE_POLL_SECONDS)
+
+    await response.write_eof()
+    return response
+
+
+async def routing_metrics(request):
+    """Per-agent model choices, latency and token averages"""
+    return web.json_response(router.metrics())
+
+
+async def health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def start_runner(app):
+    app[RUNNER_KEY].start()
+
+
+async def stop_runner(app):
+    await asyncio.to_thread(app[RUNNER_KEY].stop, 5)
+
+
+def create_app(runner=None):
+    """Build the aiohttp application around a job runner"""
+    app = web.Application()
+    app[RUNNER_KEY] = runner or JobRunner()
+    app.router.add_post("/reports", submit_report)
+    app.router.add_get("/reports/{job_id}", report_status)
+    app.router.add_get("/reports/{job_id}/result", report_result)
+    app.router.add_get("/reports/{job_id}/events", report_events)
+    app.router.add_post("/reports/{job_id}/cancel", cancel_report)
+    app.router.add_get("/metrics", routing_metrics)
+    app.router.add_get("/health", health)
+    app.on_startup.append(start_runner)
+    app.on_cleanup.append(stop_runner)
+    return app
+
+
+def main():
+    if not os.getenv("NEWSAPI_KEY") or not os.getenv("OPENAI_API_KEY"):
+        print("Error: NEWSAPI_KEY and OPENAI_API_KEY must be set in your .env file.")
+        return
+
+    print(f"Starting report service on http://{SERVER_HOST}:{SERVER_PORT}")
+    web.run_app(create_app(), host=SERVER_HOST, port=SERVER_PORT)
+
+
+if __name__ == "__main__":
+    main()
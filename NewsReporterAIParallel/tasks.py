@@ -1,5 +1,7 @@
 from crewai import Task
 from agents import reporter1, reporter2, analyst
+from cancellation import DeadlineExceeded
+from clustering import format_clusters
 
 report_task1 = Task(
     description="""Use the news_fetcher tool to get political news from India. 
@@ -36,7 +38,75 @@ summary_task = Task(
     - Brief bullet points summarizing the 3 technology headlines
     
     ## Key Insights
-    - 2-3 key insights or trends identified from the collected news""",
+    - 2-3 key insights or trends identified from the collected news, favouring stories
+      covered by more articles""",
     agent=analyst,
     context=[report_task1, report_task2]  # This ensures the analyst gets outputs from both reporters
-)
\ No newline at end of file
+)
+
+# News category each reporter covers, and its section of the final report
+REPORT_CATEGORIES = {
+    reporter1.role: "politics",
+    reporter2.role: "tech",
+}
+CATEGORY_SECTIONS = {
+    "politics": "Political News Summary (India)",
+    "tech": "Technology News Summary (Global)",
+}
+REPORT_SECTIONS = {role: CATEGORY_SECTIONS[category] for role, category in REPORT_CATEGORIES.items()}
+
+def missing_reason(error):
+    """Why a stage has no output, worded to follow the agent's role"""
+    if isinstance(error, DeadlineExceeded):
+        return "did not finish in time"
+    message = str(error).strip().splitlines()
+    return f"failed ({message[0][:200]})" if message else f"failed ({type(error).__name__})"
+
+STORY_LEGEND = " (★ = headline, n× = n articles)"
+
+def _headline_sections(sections, legend=""):
+    parts = [f"\n\nHeadlines collected by the reporters{legend}:"]
+    for role, text in sections.items():
+        parts.append(f"\n### {REPORT_SECTIONS.get(role, role)}\n{text}")
+    return "".join(parts)
+
+def summary_inputs(reports, missing, clusters=None):
+    """Text appended to the summary task with the reporters' headlines
+
+    reports maps reporter roles to their output; missing maps the roles
+    that failed or missed their deadline to missing_reason(); clusters maps
+    categories to clustering.cluster_articles() output. Story lines replace
+    a reporter's output only where they fit in its length, and the result
+    is never longer than with the reporters' output alone.
+    """
+    headlines = _headline_sections(reports)
+    if clusters:
+        # Each category pays its share of the legend out of its reporter's length
+        overhead = -(-len(STORY_LEGEND) // len(reports))
+        sections = dict(reports)
+        for role, report in reports.items():
+            budget = len(report) - overhead
+            stories = format_clusters(clusters.get(REPORT_CATEGORIES.get(role)) or [], max_chars=budget)
+            if stories and len(stories) <= budget:
+                sections[role] = stories
+        with_stories = _headline_sections(sections, STORY_LEGEND)
+        if sections != reports and len(with_stories) <= len(headlines):
+            headlines = with_stories
+
+    parts = [headlines]
+    if missing:
+        sections = ", ".join(f"{REPORT_SECTIONS.get(role, role)} (the reporter {reason})"
+                             for role, reason in missing.items())
+        parts.append(f"""\n\nThis is a PARTIAL report: no headlines are available for {sections}.
+    Summarize only the headlines above, leave out the missing sections, and say in
+    Key Insights that the report is partial.""")
+    return "".join(parts)
+
+def fallback_report(reports, missing):
+    """Report assembled from reporter output alone, for when the analyst cannot run"""
+    parts = []
+    for role, report in reports.items():
+        parts.append(f"## {REPORT_SECTIONS.get(role, role)}\n{report}")
+    for role, reason in missing.items():
+        parts.append(f"## {REPORT_SECTIONS.get(role, role)}\n- Not available: the reporter {reason}.")
+    return "\n\n".join(parts)
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Tests for the job queue leases shared by several processes.
+
+Two JobStore instances on one database file stand in for the Streamlit app
+and the HTTP service. Run with: python -m unittest test_jobs
+"""
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+import jobs
+
+LEASE_SECONDS = 0.2
+
+
+class JobStoreLeaseTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "jobs.db")
+        patcher = mock.patch.object(jobs, "JOB_LEASE_SECONDS", LEASE_SECONDS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ui = jobs.JobStore(path, worker_id="ui")
+        self.api = jobs.JobStore(path, worker_id="api")
+        for store in (self.ui, self.api):
+            self.addCleanup(store._conn.close)
+
+    def expire_leases(self):
+        time.sleep(LEASE_SECONDS * 1.5)
+
+    def test_claim_is_exclusive(self):
+        job_id = self.ui.submit()
+        job = self.ui.claim_next()
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["claimed_by"], "ui")
+        self.assertIsNone(self.api.claim_next())
+
+    def test_live_lease_is_not_requeued(self):
+        job_id = self.ui.submit()
+        self.ui.claim_next()
+        self.assertEqual(self.api.requeue_expired(), [])
+        self.assertEqual(self.api.get(job_id)["status"], jobs.RUNNING)
+
+    def test_renewed_lease_is_not_requeued(self):
+        job_id = self.ui.submit()
+        self.ui.claim_next()
+        for _ in range(3):
+            time.sleep(LEASE_SECONDS / 2)
+            held, _ = self.ui.renew_leases([job_id])
+            self.assertEqual(held, {job_id})
+        self.assertEqual(self.api.requeue_expired(), [])
+
+    def test_expired_lease_is_requeued_and_reclaimed(self):
+        job_id = self.ui.submit()
+        self.ui.claim_next()
+        self.expire_leases()
+
+        self.assertEqual(self.api.requeue_expired(), [job_id])
+        job = self.api.get(job_id)
+        self.assertEqual(job["status"], jobs.QUEUED)
+        self.assertIsNone(job["claimed_by"])
+
+        self.assertEqual(self.api.claim_next()["claimed_by"], "api")
+        held, _ = self.ui.renew_leases([job_id])
+        self.assertEqual(held, set())
+
+    def test_finish_after_losing_lease_is_ignored(self):
+        job_id = self.ui.submit()
+        self.ui.claim_next()
+        self.expire_leases()
+        self.api.requeue_expired()
+        self.api.claim_next()
+
+        self.assertFalse(self.ui.finish(job_id, result="stale"))
+        self.assertEqual(self.api.get(job_id)["status"], jobs.RUNNING)
+
+        self.assertTrue(self.api.finish(job_id, result="report"))
+        job = self.ui.get(job_id)
+        self.assertEqual((job["status"], job["result"]), (jobs.SUCCEEDED, "report"))
+        self.assertFalse(self.ui.finish(job_id, result="stale"))
+        self.assertEqual(self.ui.get(job_id)["result"], "report")
+
+    def test_cross_process_cancel(self):
+        job_id = self.ui.submit()
+        self.ui.claim_next()
+
+        self.assertTrue(self.api.request_cancel(job_id))
+        held, cancel_requested = self.ui.renew_leases([job_id])
+        self.assertEqual((held, cancel_requested), ({job_id}, {job_id}))
+
+        self.assertTrue(self.ui.finish(job_id, error="Cancelled by user", status=jobs.CANCELLED))
+        self.assertEqual(self.api.get(job_id)["status"], jobs.CANCELLED)
+        self.assertFalse(self.api.request_cancel(job_id))
+
+    def test_cancel_requested_job_with_expired_lease_is_cancelled(self):
+        job_id = self.ui.submit()
+        self.ui.claim_next()
+        self.api.request_cancel(job_id)
+        self.expire_leases()
+
+        self.assertEqual(self.api.requeue_expired(), [])
+        self.assertEqual(self.api.get(job_id)["status"], jobs.CANCELLED)
+
+    def test_cancel_queued_job(self):
+        job_id = self.ui.submit()
+        self.assertFalse(self.api.request_cancel(job_id))
+        self.assertTrue(self.api.cancel_queued(job_id))
+        self.assertIsNone(self.ui.claim_next())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,81 @@
 import os
+import contextvars
+from contextlib import contextmanager
 import requests
 from crewai_tools import tool
 from dotenv import load_dotenv
+from cancellation import RunCancelled, current_token, run_cancellable
+from ranking import rank_articles
 
 load_dotenv()
 
 NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
+# Point at a local stand-in (see mock_services.py) for reproducible runs
+NEWSAPI_BASE_URL = os.getenv("NEWSAPI_BASE_URL", "https://newsapi.org").rstrip("/")
+
+# Query cascades, tried in order until one returns enough relevant articles
+POLITICS_QUERIES = [
+    "India government OR Indian politics OR Modi OR BJP OR Congress OR election",
+    "Indian parliament OR Delhi OR BJP OR Congress OR political",
+    "India"
+]
+POLITICS_DOMAINS = "timesofindia.com,ndtv.com,hindustantimes.com,indianexpress.com"
+
+TECH_QUERIES = [
+    "artificial intelligence OR machine learning OR startup funding OR tech innovation",
+    "technology breakthrough OR AI OR software OR tech company",
+    "technology"
+]
+TECH_DOMAINS = "techcrunch.com,theverge.com,wired.com,arstechnica.com,engadget.com"
+
+# Keyword filters; also the category profiles articles are ranked against
+POLITICS_KEYWORDS = ["government", "politics", "political", "minister", "bjp", "congress",
+                     "election", "parliament", "modi", "policy", "cabinet"]
+TECH_KEYWORDS = ["technology", "tech", "ai", "software", "app", "innovation", "startup"]
+FINANCE_KEYWORDS = ["stock", "nasdaq", "nyse", "dividend", "earnings", "vs", "comparison"]
+
+REQUEST_TIMEOUT = 30
+# Fetch a full page of candidates and rank them, rather than keeping the first few
+CANDIDATES_PER_QUERY = 100
+HEADLINE_COUNT = 3
+
+# Articles fetched during the current report run (see history.py)
+_captured_articles = contextvars.ContextVar("captured_articles", default=None)
+
+@contextmanager
+def capture_articles():
+    """Collect every article the fetcher returns while the block runs"""
+    captured = []
+    token = _captured_articles.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured_articles.reset(token)
+
+def _record_articles(query, category, articles, selected):
+    captured = _captured_articles.get()
+    if captured is None:
+        return
+    for rank, article in enumerate(articles, 1):
+        captured.append({
+            "query": query,
+            "category": category,
+            "rank": rank,
+            "selected": rank <= selected,
+            "title": article.get("title") or "",
+            "description": article.get("description") or "",
+            "source": (article.get("source") or {}).get("name") or "",
+            "url": article.get("url") or "",
+            "published_at": article.get("publishedAt") or "",
+        })
+
+def _get(url, params):
+    """GET that stops when the current run is cancelled or out of time"""
+    timeout = REQUEST_TIMEOUT
+    token = current_token()
+    if token is not None and token.remaining() is not None:
+        timeout = max(0.1, min(timeout, token.remaining()))
+    return run_cancellable(requests.get, url, params=params, timeout=timeout)
 
 @tool("News Fetcher Tool")
 def news_fetcher(query: str) -> str:
@@ -26,29 +96,26 @@ def fetch_news_direct(query: str) -> str:
     print(f"DEBUG: Using API key: {NEWSAPI_KEY[:8]}...")
     
     # Enhanced parameters for better results
-    url = "https://newsapi.org/v2/everything"  # Changed from top-headlines to everything for more results
+    url = f"{NEWSAPI_BASE_URL}/v2/everything"  # Changed from top-headlines to everything for more results
     
     # Adjust query based on content
-    if "politics" in query.lower() or "india" in query.lower():
+    is_politics = "politics" in query.lower() or "india" in query.lower()
+    if is_politics:
         # Try different approaches for political news
-        search_queries = [
-            "India government OR Indian politics OR Modi OR BJP OR Congress OR election",
-            "Indian parliament OR Delhi OR BJP OR Congress OR political",
-            "India"
-        ]
+        search_queries = POLITICS_QUERIES
         for search_query in search_queries:
             print(f"DEBUG: Trying political query: {search_query}")
             params = {
                 "q": search_query,
                 "apiKey": NEWSAPI_KEY,
                 "language": "en",
-                "pageSize": 10,
+                "pageSize": CANDIDATES_PER_QUERY,
                 "sortBy": "publishedAt",
-                "domains": "timesofindia.com,ndtv.com,hindustantimes.com,indianexpress.com"
+                "domains": POLITICS_DOMAINS
             }
             
             try:
-                response = requests.get(url, params=params, timeout=30)
+                response = _get(url, params)
                 if response.status_code == 200:
                     data = response.json()
                     articles = data.get("articles", [])
@@ -57,36 +124,32 @@ def fetch_news_direct(query: str) -> str:
                     for article in articles:
                         title = article.get("title", "").lower()
                         description = article.get("description", "").lower() if article.get("description") else ""
-                        if any(keyword in title + description for keyword in 
-                               ["government", "politics", "political", "minister", "bjp", "congress", 
-                                "election", "parliament", "modi", "policy", "cabinet"]):
+                        if any(keyword in title + description for keyword in POLITICS_KEYWORDS):
                             political_articles.append(article)
                     
                     if len(political_articles) >= 3:
                         articles = political_articles
                         break
+            except RunCancelled:
+                raise
             except:
                 continue
     else:
         # Tech news queries
-        search_queries = [
-            "artificial intelligence OR machine learning OR startup funding OR tech innovation",
-            "technology breakthrough OR AI OR software OR tech company",
-            "technology"
-        ]
+        search_queries = TECH_QUERIES
         for search_query in search_queries:
             print(f"DEBUG: Trying tech query: {search_query}")
             params = {
                 "q": search_query,
                 "apiKey": NEWSAPI_KEY,
                 "language": "en",
-                "pageSize": 10,
+                "pageSize": CANDIDATES_PER_QUERY,
                 "sortBy": "publishedAt",
-                "domains": "techcrunch.com,theverge.com,wired.com,arstechnica.com,engadget.com"
+                "domains": TECH_DOMAINS
             }
             
             try:
-                response = requests.get(url, params=params, timeout=30)
+                response = _get(url, params)
                 if response.status_code == 200:
                     data = response.json()
                     articles = data.get("articles", [])
@@ -96,15 +159,15 @@ def fetch_news_direct(query: str) -> str:
                         title = article.get("title", "").lower()
                         description = article.get("description", "").lower() if article.get("description") else ""
                         # Exclude financial/stock articles
-                        if not any(keyword in title + description for keyword in 
-                                  ["stock", "nasdaq", "nyse", "dividend", "earnings", "vs", "comparison"]):
-                            if any(keyword in title + description for keyword in 
-                                  ["technology", "tech", "ai", "software", "app", "innovation", "startup"]):
+                        if not any(keyword in title + description for keyword in FINANCE_KEYWORDS):
+                            if any(keyword in title + description for keyword in TECH_KEYWORDS):
                                 tech_articles.append(article)
                     
                     if len(tech_articles) >= 3:
                         articles = tech_articles
                         break
+            except RunCancelled:
+                raise
             except:
                 continue
     
@@ -112,7 +175,7 @@ def fetch_news_direct(query: str) -> str:
     print(f"DEBUG: Request params: {params}")
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = _get(url, params)
         print(f"DEBUG: Response status code: {response.status_code}")
         
         response.raise_for_status()  # Raises an HTTPError for bad responses
@@ -131,8 +194,16 @@ def fetch_news_direct(query: str) -> str:
         if not articles:
             return f"No relevant news found for query: {query}."
         
+        # Score every candidate on relevance, recency and source diversity
+        top_articles = rank_articles(articles, POLITICS_KEYWORDS if is_politics else TECH_KEYWORDS,
+                                     top_n=HEADLINE_COUNT)
+        top_ids = {id(article) for article in top_articles}
+        _record_articles(query, "politics" if is_politics else "tech",
+                         top_articles + [a for a in articles if id(a) not in top_ids],
+                         selected=len(top_articles))
+        
         headlines = []
-        for i, article in enumerate(articles[:3], 1):  # Limit to top 3
+        for i, article in enumerate(top_articles, 1):
             title = article.get("title", "No title")
             source = article.get("source", {}).get("name", "Unknown source")
             published_at = article.get("publishedAt", "")[:10]  # Get date part
@@ -149,6 +220,8 @@ def fetch_news_direct(query: str) -> str:
         print(f"DEBUG: Final result length: {len(result)} characters")
         return result
         
+    except RunCancelled:
+        raise
     except requests.exceptions.Timeout:
         error_msg = "Error: Request timeout. Please check your internet connection."
         print(f"DEBUG: {error_msg}")